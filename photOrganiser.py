@@ -13,18 +13,45 @@ PhoTools > PhotOrganiser
 """
 
 import argparse
+import atexit
+import errno
+import os
 import subprocess
+import threading
+import time
 import json
+import multiprocessing
 import re
 import shutil
-import uuid
-from math import floor
-from distutils.util import strtobool
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from datetime import datetime
+
+try:
+    import pyexiv2
+except ImportError:
+    # fall back to the exiv2 command line tool
+    pyexiv2 = None
 
 global _verbose_output
 
+# Max number of file paths passed to a single exiv2 call.
+_EXIV2_BATCH_SIZE: int = 500
+# Number of concurrent tag reads and file moves.
+_MAX_WORKERS: int = os.cpu_count() or 1
+# Max number of tag read batches, and of moves, queued ahead of their consumer.
+_MAX_PENDING: int = _MAX_WORKERS * 2
+# Log file, opened on first write and kept open until exit.
+_log_file = None
+_log_lock: threading.Lock = threading.Lock()
+# Log timestamp, reformatted at most once per second.
+_log_second: int = -1
+_log_timestamp: str = ""
+# Minimum seconds between progress redraws, and the time of the last one.
+_PROGRESS_INTERVAL: float = 1 / 30
+_last_progress: float = 0.0
+
 
 class AVAILABLE_META_TYPES:
     IPTC: str = "IPTC"
@@ -47,135 +74,406 @@ class AVAILABLE_FILE_TYPES:
     TIF: str = "TIF"
     TIFF: str = "TIFF"
     PNG: str = "PNG"
-    ALL: tuple = (JPG, JPEG, TIF, TIFF, PNG)
-
-
-def _v(message: str) -> None:
+    # file types with a standard IPTC block
+    IPTC_CAPABLE: frozenset = frozenset((JPG, JPEG, TIF, TIFF))
+    ALL: frozenset = IPTC_CAPABLE | {PNG}
+
+
+# Tag search patterns, each capturing its information in a group named after
+# its AVAILABLE_TAG_INFO_SEARCH option. All are compiled into one pattern so
+# that every tag is scanned once, however many searches are registered.
+# Tags are upper-cased when read, so patterns are written in upper case and
+# compiled case-sensitively, letting the engine scan for their literal prefix.
+_TAG_INFO_PATTERNS: dict[str, str] = {
+    # Extracts YEARS from IPTC KEYWORD tags that include the "DATE" token, e.g.: [DATE: 1984]
+    # Takes the last 4-digit run within 64 characters of DATE, e.g.: [DATE: 12/05/1990]
+    AVAILABLE_TAG_INFO_SEARCH.YEAR: r"DATE.{0,64}(?P<YEAR>\d{4})",
+}
+_TAG_INFO_RE: re.Pattern = re.compile(
+    "|".join(f"(?:{pattern})" for pattern in _TAG_INFO_PATTERNS.values())
+)
+
+
+def _v(message: str | Callable[[], str]) -> None:
+    # Callables are verbose-only detail, only built when they will be printed.
     global _verbose_output
+    if callable(message):
+        if not _verbose_output:
+            return
+        message = message()
     print(f"{message}", end="\n\n") if _verbose_output else None
     _write_log(message)
 
 
 def _get_files(root_dir: Path) -> tuple:
-    found_paths = [p for p in root_dir.rglob("*") if p.is_file()]
     valid_paths = []
     excluded_paths = []
-    for p in found_paths:
-        if p.suffix.upper().strip(".") in AVAILABLE_FILE_TYPES.ALL:
-            valid_paths.append(p)
+    for entry in _iter_files(root_dir):
+        extension = os.path.splitext(entry.name)[1].upper().strip(".")
+        if extension in AVAILABLE_FILE_TYPES.ALL:
+            valid_paths.append(Path(entry.path))
         else:
-            excluded_paths.append(p)
+            excluded_paths.append(Path(entry.path))
     return valid_paths, excluded_paths
 
 
-def _get_iptc_keywords(file_paths: list[Path]) -> list[dict]:
-    results: list = []
-    print("Reading tags...")
-    for idx, f in enumerate(file_paths):
-        tags: list = []
-        read = subprocess.run(
-            ["exiv2", "-PI", f],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True,
+def _iter_files(path: Path | str):
+    # DirEntry caches the file type from the directory listing, so no
+    # extra stat() is needed per entry. Symlinks are not followed.
+    try:
+        entries = os.scandir(path)
+    except PermissionError:
+        # unreadable directories are skipped, as Path.rglob did
+        return
+    with entries:
+        for entry in entries:
+            if entry.is_symlink():
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_files(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+def _get_iptc_keywords(file_paths: list[Path]) -> Iterator[dict]:
+    # Files that cannot hold IPTC data are not read. They are passed on after
+    # the reads, so that nothing is moved before every read has been started.
+    iptc_paths: list[Path] = []
+    other_paths: list[Path] = []
+    for f in file_paths:
+        if f.suffix.upper().strip(".") in AVAILABLE_FILE_TYPES.IPTC_CAPABLE:
+            iptc_paths.append(f)
+        else:
+            other_paths.append(f)
+    file_paths = iptc_paths
+    read_batch = _read_iptc_batch if pyexiv2 is None else _read_iptc_files
+    # spread the files evenly over the workers, within the exiv2 batch limit
+    batch_size = max(1, min(_EXIV2_BATCH_SIZE, -(-len(file_paths) // _MAX_WORKERS)))
+    # exiv2 runs in child processes, so threads suffice; pyexiv2 parses
+    # in-process, so it is spread over worker processes instead. These are
+    # spawned, not forked, as the mover's threads may already be running and
+    # holding locks (log, stdout) when the pool starts.
+    executor = (
+        ThreadPoolExecutor(max_workers=_MAX_WORKERS)
+        if pyexiv2 is None
+        else ProcessPoolExecutor(
+            max_workers=_MAX_WORKERS, mp_context=multiprocessing.get_context("spawn")
         )
-        meta_data = read.stdout.splitlines()
-        for item in meta_data:
-            item_data = item.split()
-            tags.append(" ".join(item_data[3:]))
-        results.append({"file_path": f, "tags": tags, "errors": read.stderr})
-        _show_progress(idx, len(file_paths))
-    print("\nTask complete.", end="\n\n")
-    return results
-
-
-def find_target_tags(files: list, tag_info_search: str) -> list[dict]:
-    results: list = []
-    if tag_info_search == AVAILABLE_TAG_INFO_SEARCH.YEAR:
-        # Extracts YEARS from IPTC KEYWORD tags that include the "DATE" token, e.g.: [DATE: 1984]
-        pattern = r"(?i)date.*(\d{4}?)"
+    )
+    with executor:
+        pending: deque[tuple] = deque()
+        for idx in range(0, len(file_paths), batch_size):
+            batch = file_paths[idx : idx + batch_size]
+            try:
+                future = executor.submit(read_batch, batch)
+            except Exception as e:
+                # e.g. the pool was broken by an earlier worker crash
+                future = Future()
+                future.set_exception(e)
+            pending.append((batch, future))
+            if len(pending) > _MAX_PENDING:
+                yield from _batch_results(*pending.popleft())
+        while pending:
+            yield from _batch_results(*pending.popleft())
+    for f in other_paths:
+        yield {"file_path": f, "tags": [], "errors": ""}
+
+
+def _batch_results(batch: list[Path], future: Future) -> list[dict]:
+    # A batch that failed as a whole (e.g. exiv2 missing, or a crashed worker)
+    # is reported against each of its files, with no tags, so they are not moved.
+    try:
+        return future.result()
+    except Exception as e:
+        return [
+            {"file_path": f, "tags": None, "errors": f"Tags could not be read: {e}"}
+            for f in batch
+        ]
+
+
+def _read_iptc_files(file_paths: list[Path]) -> list[dict]:
+    return [_read_iptc_file(f) for f in file_paths]
+
+
+def _read_iptc_file(file_path: Path) -> dict:
+    tags: list = []
+    errors: str = ""
+    try:
+        img = pyexiv2.Image(str(file_path))
+        try:
+            keywords = img.read_iptc().get("Iptc.Application2.Keywords", [])
+        finally:
+            img.close()
+        # a single keyword is returned as a plain string
+        keywords = [keywords] if isinstance(keywords, str) else keywords
+        tags = [keyword.upper() for keyword in keywords]
+    except Exception as e:
+        errors = str(e)
+    return {"file_path": file_path, "tags": tags, "errors": errors}
+
+
+def _read_iptc_batch(file_paths: list[Path]) -> list[dict]:
+    # A single exiv2 call for the whole batch. When given more than one file,
+    # exiv2 prefixes every output line with the path of the file it belongs to.
+    paths: list[str] = [str(f) for f in file_paths]
+    tags: list[list] = [[] for _ in paths]
+    errors: list[list] = [[] for _ in paths]
+    read = subprocess.run(
+        ["exiv2", "-PI", *paths],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    multi_file: bool = len(paths) > 1
+    current: int = 0
+    for item in read.stdout.splitlines():
+        if multi_file:
+            owner = _find_owner(item, paths, current, _is_output_line)
+            if owner is None:
+                continue
+            current = owner
+            item = item[len(paths[owner]) :]
+        # key, type and size columns, then the value as printed
+        item_data = item.split(None, 3)
+        if len(item_data) == 4:
+            tags[current].append(item_data[3].upper())
+    # messages naming no file (e.g. library warnings) belong to the batch
+    batch_errors: list[str] = []
+    current = 0
+    for item in read.stderr.splitlines():
+        if multi_file:
+            owner = _find_owner(item, paths, current, _is_error_line)
+            if owner is None:
+                batch_errors.append(item)
+                continue
+            current = owner
+        errors[current].append(item)
+    if batch_errors:
+        _v("exiv2 reported: \n\n" + "\n".join(batch_errors))
+    return [
+        {"file_path": f, "tags": t, "errors": "\n".join(e)}
+        for f, t, e in zip(file_paths, tags, errors)
+    ]
+
+
+def _is_output_line(line: str, path: str) -> bool:
+    return line.startswith(path) and line[len(path) :].lstrip().startswith("Iptc.")
+
+
+def _is_error_line(line: str, path: str) -> bool:
+    # "<path>: <message>", or the header exiv2 prints before an exception
+    return (
+        line.startswith(path) and line[len(path) : len(path) + 1] == ":"
+    ) or line == f"Exiv2 exception in print action for file {path}:"
+
+
+def _find_owner(line: str, paths: list[str], start: int, belongs) -> int | None:
+    # exiv2 reports files in the order given, so search forward from the last owner.
+    for idx in range(start, len(paths)):
+        if belongs(line, paths[idx]):
+            return idx
+    return None
+
+
+def find_target_tags(files: Iterable[dict], tag_info_search: str) -> Iterator[dict]:
+    if tag_info_search in _TAG_INFO_PATTERNS:
         for f in files:
-            for tag in f["tags"]:
-                match = re.search(pattern, tag, re.IGNORECASE)
-                if match:
-                    break
-            results.append(
-                {
-                    "file_path": f["file_path"],
-                    "toi": match.group(1) if match else None,
-                    "errors": "",
-                }
+            if f["tags"] is None:
+                yield {"file_path": f["file_path"], "toi": None, "errors": f["errors"]}
+                continue
+            toi = next(
+                (
+                    m.group(tag_info_search)
+                    for tag in f["tags"]
+                    for m in _TAG_INFO_RE.finditer(tag)
+                    if m.group(tag_info_search)
+                ),
+                None,
             )
-    return results
+            yield {"file_path": f["file_path"], "toi": toi, "errors": ""}
 
 
-def _move_images(images: list, root_dir: Path, rename_files: bool) -> tuple(list[dict]):
-    successful: list[dict] = []
-    errors: list[dict] = []
-    print("Moving images...")
-    for idx, img in enumerate(images):
+def _move_images(
+    images: Iterable[dict],
+    root_dir: Path,
+    rename_files: bool,
+    total: int,
+    successful: list[dict],
+    errors: list[dict],
+) -> None:
+    # Results are added to the caller's lists as moves complete, so that they
+    # are still there to be logged if the run stops part way through.
+    made_dirs: set[Path] = set()
+    # destinations already taken by an earlier image in this run
+    claimed: set[Path] = set()
+    pending: deque[Future] = deque()
+    done: int = 0
+    with ThreadPoolExecutor(max_workers=_MAX_WORKERS) as executor:
         try:
-            target_dir: Path = (
-                root_dir / Path(img["toi"])
-                if img["toi"]
-                else root_dir / Path("unorganised")
-            )
-            target_dir.mkdir(parents=True, exist_ok=True)
-            try:
-                new_path: Path = Path(
-                    shutil.move(
-                        img["file_path"],
-                        target_dir / _gen_filename(img["file_path"].suffix)
-                        if rename_files
-                        else target_dir,
+            for img in images:
+                if img["errors"]:
+                    errors.append(
+                        {"old_filepath": img["file_path"], "error": img["errors"]}
                     )
-                ).resolve()
-                successful.append(
-                    {"new_filepath": new_path, "old_filepath": img["file_path"]}
+                    done += 1
+                    continue
+                target_dir: Path = (
+                    root_dir / Path(img["toi"])
+                    if img["toi"]
+                    else root_dir / Path("unorganised")
+                )
+                if target_dir not in made_dirs:
+                    try:
+                        target_dir.mkdir(parents=True, exist_ok=True)
+                    except Exception as e:
+                        errors.append(
+                            {"old_filepath": img["file_path"], "error": str(e)}
+                        )
+                        done += 1
+                        continue
+                    made_dirs.add(target_dir)
+                destination: Path = target_dir / (
+                    _gen_filename(img["file_path"].suffix)
+                    if rename_files
+                    else img["file_path"].name
                 )
-            except shutil.Error as e:
-                _v("File already exists as this path. Not moving.")
-        except Exception as e:
-            errors.append({"old_filepath": img["file_path"], "error": str(e)})
-        _show_progress(idx, len(images))
-    print("\nTask complete.", end="\n\n")
-    return successful, errors
+                if destination in claimed:
+                    _v("File already exists as this path. Not moving.")
+                    done += 1
+                    continue
+                claimed.add(destination)
+                pending.append(executor.submit(_move_image, img, destination))
+                done += _collect_moves(pending, successful, errors, _MAX_PENDING)
+                _show_progress(done, total)
+        finally:
+            # moves already handed to the pool are always collected
+            done += _collect_moves(pending, successful, errors, 0)
+            _show_progress(done, total)
+
+
+def _collect_moves(
+    pending: deque[Future], successful: list[dict], errors: list[dict], limit: int
+) -> int:
+    # Collects finished moves in order, waiting on the oldest while more
+    # than `limit` are outstanding. Returns the number collected.
+    collected: int = 0
+    while pending and (pending[0].done() or len(pending) > limit):
+        moved, failed = pending.popleft().result()
+        if moved:
+            successful.append(moved)
+        if failed:
+            errors.append(failed)
+        collected += 1
+    return collected
+
+
+def _move_image(img: dict, destination: Path) -> tuple:
+    try:
+        _move_file(img["file_path"], destination)
+        return {"new_filepath": destination, "old_filepath": img["file_path"]}, None
+    except FileExistsError:
+        _v("File already exists as this path. Not moving.")
+        return None, None
+    except Exception as e:
+        return None, {"old_filepath": img["file_path"], "error": str(e)}
+
+
+# errors from os.link meaning the filesystem does not support hard links
+_NO_LINK_ERRNOS: frozenset = frozenset(
+    (errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP)
+)
+
+
+def _move_file(source: Path, destination: Path) -> None:
+    # Never overwrites: raises FileExistsError if the destination exists,
+    # including under another case on case-insensitive filesystems.
+    try:
+        # on the same filesystem, link to the new path then drop the old one
+        os.link(source, destination)
+    except FileExistsError:
+        raise
+    except OSError as e:
+        if e.errno == errno.EXDEV:
+            _copy_file(source, destination)
+        elif e.errno in _NO_LINK_ERRNOS:
+            # No hard links (e.g. FAT/exFAT, some SMB mounts): rename instead.
+            # The existence check and the rename are not atomic, so a file
+            # created at the destination in between could still be replaced.
+            if destination.exists():
+                raise FileExistsError(errno.EEXIST, "File exists", str(destination))
+            os.rename(source, destination)
+            return
+        else:
+            raise
+    os.unlink(source)
+
+
+def _copy_file(source: Path, destination: Path) -> None:
+    # "x" mode creates the destination exclusively
+    try:
+        with open(source, "rb") as src, open(destination, "xb") as dst:
+            shutil.copyfileobj(src, dst)
+        shutil.copystat(source, destination)
+    except FileExistsError:
+        raise
+    except Exception:
+        destination.unlink(missing_ok=True)
+        raise
 
 
 def _gen_filename(suffix: str) -> Path:
-    return Path(str(uuid.uuid4()) + suffix)
+    return Path(os.urandom(16).hex() + suffix)
 
 
 def _show_progress(current: int, total: int) -> None:
+    global _last_progress
+    if total == 0:
+        return
+    now = time.monotonic()
+    # always draw the final update, so the bar ends at 100%
+    if now - _last_progress < _PROGRESS_INTERVAL and current < total:
+        return
+    _last_progress = now
     print(
-        f"Progress: [{current}/{total}][{floor((current/total)*100)}%]",
+        f"Progress: [{current}/{total}][{current * 100 // total}%]",
         end="\r",
         flush=True,
     )
 
 
-def _format_json(input: list) -> list[dict]:
-    for r in input:
-        if "file_path" in r:
-            r["file_path"] = str(r["file_path"])
-        if "old_filepath" in r:
-            r["old_filepath"] = str(r["old_filepath"])
-        if "new_filepath" in r:
-            r["new_filepath"] = str(r["new_filepath"])
-    return json.dumps(input, indent=4, sort_keys=True)
+class _PathEncoder(json.JSONEncoder):
+    def default(self, o):
+        if isinstance(o, Path):
+            return str(o)
+        return super().default(o)
+
+
+def _format_json(input: list) -> str:
+    return json.dumps(input, indent=4, sort_keys=True, cls=_PathEncoder)
 
 
 def _write_log(message: str) -> None:
-    log_path = Path(".")
-    dt = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(log_path / "photOrganiser.log", "a+") as file:
-        file.seek(0)
-        data = file.read(100)
-        if len(data) > 0:
-            file.write("\n")
-        else:
-            file.write("# Output log for the fotorganizer script.\n\n")
-        file.write(f"\n{dt}   {message}")
+    global _log_file, _log_second, _log_timestamp
+    with _log_lock:
+        now = time.time()
+        if int(now) != _log_second:
+            _log_second = int(now)
+            _log_timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+        if _log_file is None:
+            _log_file = open(Path(".") / "photOrganiser.log", "a", buffering=1 << 16)
+            atexit.register(_log_file.close)
+            if _log_file.tell() == 0:
+                _log_file.write("# Output log for the fotorganizer script.\n")
+        _log_file.write(f"\n\n{_log_timestamp}   {message}")
+
+
+def _strtobool(value: str) -> bool:
+    value = value.lower()
+    if value in ("y", "yes", "t", "true", "on", "1"):
+        return True
+    if value in ("n", "no", "f", "false", "off", "0"):
+        return False
+    raise ValueError(f"Invalid truth value {value!r}.")
 
 
 def _validate_args(args: list[str | bool]) -> list[str | bool]:
@@ -216,6 +514,12 @@ def _validate_args(args: list[str | bool]) -> list[str | bool]:
     return args
 
 
+def _retain(items: Iterable[dict], store: list[dict]) -> Iterator[dict]:
+    for item in items:
+        store.append(item)
+        yield item
+
+
 def _mode_selector(meta_type: str, tag_type: str):
     if (
         meta_type == AVAILABLE_META_TYPES.IPTC
@@ -249,29 +553,44 @@ def execute(
         root_dir = Path(root_dir).resolve(strict=True)
         print("Starting process...", end="\n\n")
         found_paths, excluded_paths = _get_files(root_dir)
-        results = _mode_selector(
+        # Tags are read, searched and acted on as a stream. The intermediate
+        # results are only kept when they are going to be printed.
+        results: list[dict] = []
+        image_matches: list[dict] = []
+        tags = _mode_selector(
             meta_type=cleaned_args["meta_type"], tag_type=cleaned_args["tag_type"]
         )(found_paths)
-        image_matches = find_target_tags(
-            files=results, tag_info_search=cleaned_args["tag_info_search"]
-        )
-        moved, move_failed = _move_images(image_matches, root_dir, rename_files)
-
-        # print / log stuff
-        _v(f"{len(found_paths)} files were found in or under {root_dir}.")
-        _v(f"{len(excluded_paths)} files were excluded in or under {root_dir}.")
-        _v(
-            f"List of found files: {newline}{f'{newline}'.join([str(f) for f in found_paths]) if found_paths else 'None'}"
-        )
-        _v(
-            f"List of excluded files: {newline}{f'{newline}'.join([str(f) for f in excluded_paths]) if excluded_paths else 'None'}"
-        )
-        _v(f"Tags that were read: \n\n{_format_json(results)}")
-        _v(
-            f"Tags of interest were detected in these images: \n\n{_format_json(image_matches)}"
+        if verbose:
+            tags = _retain(tags, results)
+        matches = find_target_tags(
+            files=tags, tag_info_search=cleaned_args["tag_info_search"]
         )
-        _v(f"Moved files: \n\n{_format_json(moved)}")
-        _v(f"Failed moves: \n\n{_format_json(move_failed)}")
+        if verbose:
+            matches = _retain(matches, image_matches)
+        moved: list[dict] = []
+        move_failed: list[dict] = []
+        print("Reading tags and moving images...")
+        try:
+            _move_images(
+                matches, root_dir, rename_files, len(found_paths), moved, move_failed
+            )
+            print("\nTask complete.", end="\n\n")
+        finally:
+            # print / log stuff, even if the run stopped part way through
+            _v(f"{len(found_paths)} files were found in or under {root_dir}.")
+            _v(f"{len(excluded_paths)} files were excluded in or under {root_dir}.")
+            _v(
+                lambda: f"List of found files: {newline}{f'{newline}'.join([str(f) for f in found_paths]) if found_paths else 'None'}"
+            )
+            _v(
+                lambda: f"List of excluded files: {newline}{f'{newline}'.join([str(f) for f in excluded_paths]) if excluded_paths else 'None'}"
+            )
+            _v(lambda: f"Tags that were read: \n\n{_format_json(results)}")
+            _v(
+                lambda: f"Tags of interest were detected in these images: \n\n{_format_json(image_matches)}"
+            )
+            _v(f"Moved files: \n\n{_format_json(moved)}")
+            _v(f"Failed moves: \n\n{_format_json(move_failed)}")
     except FileNotFoundError as e:
         print("Root directory was not found. Aborting attempt.")
     except ValueError as e:
@@ -293,7 +612,7 @@ if __name__ == "__main__":
     parser.add_argument(
         "-v",
         "--verbose",
-        type=lambda x: bool(strtobool(x)),
+        type=_strtobool,
         help="Print verbose output.",
         required=False,
         choices=[True, False],
@@ -302,7 +621,7 @@ if __name__ == "__main__":
     parser.add_argument(
         "-rf",
         "--rename_files",
-        type=lambda x: bool(strtobool(x)),
+        type=_strtobool,
         help="Rename moved files.",
         required=False,
         choices=[True, False],